@@ -1,78 +1,339 @@
 import datetime as dt
+import hashlib
+import json
 import math
-
+import os
+import re
+import threading
+import time
+import zoneinfo
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import asdict, dataclass
+
+import numba
+import numpy as np
 import pandas as pd
+import redis
 import yfinance as yf
-from flask import Flask, render_template, request
+from curl_cffi import requests as curl_requests
+from flask import Flask, jsonify, render_template, request
+from pyrate_limiter import BucketFullException, Duration, Limiter, RequestRate
 
 app = Flask(__name__)
+# The template only changes on deploy: skip per-request mtime checks,
+# compile it once up front, and let browsers cache static files.
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+app.jinja_env.auto_reload = False
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 3600
+app.jinja_env.get_template("index.html")
+
+# Resolve timezones once at import (and touch them so the tz data is loaded)
+# rather than looking them up by name on every request.
+UTC = zoneinfo.ZoneInfo("UTC")
+ET = zoneinfo.ZoneInfo("US/Eastern")
+_ = dt.datetime.now(UTC).astimezone(ET)
+
 
+class YahooBusy(RuntimeError):
+    """
+    Yahoo data couldn't be fetched in time: our request budget is used up,
+    or another request for the same data is taking too long.
+    """
+
+
+class LimitedSession(curl_requests.Session):
+    """
+    curl_cffi session (what yfinance needs to get past Yahoo) that throttles
+    every outgoing request through a shared limiter, waiting at most
+    max_delay seconds for a slot.
+    """
 
-def download_data(ticker: str,
-                  tf: str = "5m",
-                  days_daily: int = 30,
-                  days_intraday: int = 5):
+    def __init__(self, limiter: Limiter, max_delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self._limiter = limiter
+        self._max_delay = max_delay
+
+    def request(self, method, url, *args, **kwargs):
+        try:
+            with self._limiter.ratelimit("yahoo", delay=True,
+                                         max_delay=self._max_delay):
+                return super().request(method, url, *args, **kwargs)
+        except BucketFullException:
+            raise YahooBusy(
+                "Too many requests to Yahoo right now; try again in a few seconds."
+            ) from None
+
+
+# Shared HTTP session for yfinance, throttled so we don't trip Yahoo's rate
+# limiting. yfinance refuses caching sessions (requests_cache), so response
+# caching is left to download_data_cached (and Redis, when configured).
+# yfinance's own cookie/crumb/timezone lookups share this budget too.
+# Longest we let a request wait on Yahoo: for a limiter slot, or for
+# another thread's download of the same data.
+YAHOO_MAX_WAIT = 10
+
+SESSION = LimitedSession(
+    Limiter(RequestRate(2, Duration.SECOND * 5)),
+    max_delay=YAHOO_MAX_WAIT,
+    impersonate="chrome",
+)
+
+# Optional result cache shared by all gunicorn workers (set REDIS_URL to
+# enable). Fresh entries live for a 30s bucket; a ":stale" copy of the last
+# good result is kept longer and served if Yahoo fails.
+_REDIS_URL = os.environ.get("REDIS_URL")
+# Short socket timeouts so an unreachable or hung Redis fails fast and
+# the request carries on uncached.
+_redis = (
+    redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+        _REDIS_URL, socket_timeout=0.25, socket_connect_timeout=0.25,
+    ))
+    if _REDIS_URL else None
+)
+# Results are bucketed into RESULT_WINDOW-second windows (Redis keys and
+# /api/stops ETags).
+RESULT_WINDOW = 30
+RESULT_TTL = 60
+STALE_RESULT_TTL = 24 * 60 * 60
+
+# Lookback windows, passed to Yahoo as period= strings so neither we nor
+# yfinance build start/end datetimes per request. A month of daily bars
+# covers ATR(14); five days of intraday bars covers the example bar.
+DAILY_PERIOD = "1mo"
+INTRADAY_PERIOD = "5d"
+
+# Request threads per server process (waitress below; keep the Procfile's
+# gunicorn --threads in step).
+SERVER_THREADS = 16
+_PREFETCH_WORKERS = 4
+
+# Warm-up downloads started from GET / so the following POST finds the
+# data already cached. Kept on a separate pool: these jobs block on
+# _download_executor, so sharing it could deadlock. GET / is
+# unauthenticated, so at most _PREFETCH_MAX_PENDING run or wait at once and
+# anything beyond that is dropped.
+_prefetch_executor = ThreadPoolExecutor(max_workers=_PREFETCH_WORKERS)
+_PREFETCH_MAX_PENDING = 8
+_prefetch_slots = threading.BoundedSemaphore(_PREFETCH_MAX_PENDING)
+_TICKER_RE = re.compile(r"[A-Z0-9.^=-]{1,20}")
+
+# Daily and intraday downloads are independent, so run them side by side:
+# the daily one goes to this pool while the calling thread fetches the
+# intraday one. One worker per thread that can call download_data, so
+# concurrent requests don't queue behind each other here.
+_download_executor = ThreadPoolExecutor(
+    max_workers=SERVER_THREADS + _PREFETCH_WORKERS
+)
+
+# Recent (daily, intra) frames keyed by (ticker, tf, minute bucket), so a
+# ticker requested twice within the same minute only hits Yahoo once.
+# Downloads in progress are tracked per (ticker, tf) so concurrent callers
+# (e.g. a prefetch and the submit it was for) share one fetch.
+# Daily bars only change once a day, so they're also kept separately per
+# (ticker, 6h bucket) and reused across those per-minute entries.
+_DATA_CACHE_MAX = 256
+DAILY_CACHE_SECONDS = 6 * 60 * 60
+_data_cache: "OrderedDict[tuple, tuple[pd.DataFrame, pd.DataFrame]]" = OrderedDict()
+_daily_cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_data_inflight: "dict[tuple[str, str], Future]" = {}
+_data_cache_lock = threading.Lock()
+
+
+def _history(ticker: str, period: str, interval: str) -> pd.DataFrame:
+    # Ticker.history goes through our rate-limited session.
+    # One Ticker per call: history() keeps per-instance state, so sharing
+    # an instance across threads isn't safe.
+    yt = yf.Ticker(ticker, session=SESSION)
+    return yt.history(period=period, interval=interval, auto_adjust=False)
+
+
+def download_data(ticker: str, tf: str = "5m",
+                  daily: pd.DataFrame | None = None):
     """
     Pull recent daily data (for ATR) and intraday data (for context).
     tf: "1m" or "5m" intraday timeframe.
+    daily: already-known daily bars; only intraday bars are fetched then.
     """
-    end = dt.datetime.now()
-    start_daily = end - dt.timedelta(days=days_daily)
-    start_intra = end - dt.timedelta(days=days_intraday)
-
-    daily = yf.download(
-        ticker, start=start_daily, end=end, interval="1d", auto_adjust=False
-    )
-    intra = yf.download(
-        ticker, start=start_intra, end=end, interval=tf, auto_adjust=False
-    )
+    if daily is None:
+        f_daily = _download_executor.submit(_history, ticker, DAILY_PERIOD, "1d")
+        intra = _history(ticker, INTRADAY_PERIOD, tf)
+        daily = f_daily.result()
+    else:
+        intra = _history(ticker, INTRADAY_PERIOD, tf)
 
     if intra.empty or daily.empty:
         return daily, intra
 
+    return daily, _regular_hours(intra)
+
+
+def _regular_hours(intra: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert intraday bars to US/Eastern and keep regular trading hours.
+    """
     # yfinance intraday index is usually tz-aware (UTC); guard tz_localize.
     if intra.index.tz is None:
-        intra = intra.tz_localize("UTC")
-    intra = intra.tz_convert("US/Eastern")
+        intra = intra.tz_localize(UTC)
+    intra = intra.tz_convert(ET)
 
     # Keep only regular trading hours
-    intra = intra.between_time("09:30", "16:00")
+    return intra.between_time("09:30", "16:00")
 
-    return daily, intra
+
+def download_data_cached(ticker: str, tf: str = "5m"):
+    """
+    Same as download_data, but reuses results for up to a minute
+    (the cache key rolls over with each wall-clock minute), and joins a
+    download already in progress for the same ticker/timeframe, waiting
+    up to YAHOO_MAX_WAIT seconds for it before raising YahooBusy.
+    """
+    key = (ticker.upper(), tf, int(time.time() // 60))
+    with _data_cache_lock:
+        if key in _data_cache:
+            _data_cache.move_to_end(key)
+            return _data_cache[key]
+        future = _data_inflight.get(key[:2])
+        if future is None:
+            future = _data_inflight[key[:2]] = Future()
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        try:
+            return future.result(timeout=YAHOO_MAX_WAIT)
+        except FutureTimeout:
+            raise YahooBusy(
+                f"Still waiting on Yahoo for {key[0]}; try again in a few seconds."
+            ) from None
+
+    daily_key = (key[0], int(time.time() // DAILY_CACHE_SECONDS))
+    with _data_cache_lock:
+        daily = _daily_cache.get(daily_key)
+        if daily is not None:
+            _daily_cache.move_to_end(daily_key)
+
+    try:
+        data = download_data(ticker, tf=tf, daily=daily)
+    except BaseException as e:
+        with _data_cache_lock:
+            del _data_inflight[key[:2]]
+        future.set_exception(e)
+        raise
+
+    with _data_cache_lock:
+        del _data_inflight[key[:2]]
+        # Don't pin empty frames; Yahoo sometimes returns nothing transiently.
+        if not data[0].empty:
+            _cache_put(_daily_cache, daily_key, data[0])
+        if not (data[0].empty or data[1].empty):
+            _cache_put(_data_cache, key, data)
+    future.set_result(data)
+    return data
+
+
+def _cache_put(cache: OrderedDict, key, value) -> None:
+    # Caller holds _data_cache_lock.
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _DATA_CACHE_MAX:
+        cache.popitem(last=False)
+
+
+def _start_prefetch(ticker: str, tf: str) -> None:
+    """
+    Kick off download_data_cached in the background, unless the data is
+    already cached or being fetched, or too many prefetches are pending.
+    """
+    ticker = ticker.upper()
+    if not _TICKER_RE.fullmatch(ticker):
+        return
+    with _data_cache_lock:
+        if ((ticker, tf, int(time.time() // 60)) in _data_cache
+                or (ticker, tf) in _data_inflight):
+            return
+    if not _prefetch_slots.acquire(blocking=False):
+        return
+    future = _prefetch_executor.submit(download_data_cached, ticker, tf)
+    future.add_done_callback(lambda f: _prefetch_slots.release())
+
+
+@numba.njit(cache=True)
+def _ewm_last(values, alpha):
+    # Recursive smoothing as in ewm(alpha=alpha, adjust=False), keeping
+    # only the final value. Seeds from the first non-NaN value; NaNs after
+    # that still decay the running weight, matching pandas' ignore_na=False.
+    out = np.nan
+    old_wt = 1.0
+    for i in range(values.shape[0]):
+        x = values[i]
+        if np.isnan(out):
+            out = x
+            continue
+        old_wt *= 1.0 - alpha
+        if not np.isnan(x):
+            out = (old_wt * out + alpha * x) / (old_wt + alpha)
+            old_wt = 1.0
+    return out
 
 
 def compute_atr(daily: pd.DataFrame, period: int = 14) -> float:
     """
     Compute Wilder-style ATR on daily OHLC.
     """
-    high = daily["High"]
-    low = daily["Low"]
-    close = daily["Close"]
+    high = daily["High"].to_numpy(dtype=np.float64)
+    low = daily["Low"].to_numpy(dtype=np.float64)
+    prev_close = np.roll(daily["Close"].to_numpy(dtype=np.float64), 1)
+    prev_close[0] = np.nan
+
+    # fmax skips the NaN on the first bar (like DataFrame.max), leaving high - low.
+    tr = np.fmax.reduce([high - low,
+                         np.abs(high - prev_close),
+                         np.abs(low - prev_close)])
+    return float(_ewm_last(tr, 2.0 / (period + 1)))
+
+
+# Time-of-day buckets (minutes after midnight, US/Eastern) and their factors:
+# before 10:00, 10:00-11:00, 11:00-13:00, 13:00-14:30, 14:30 onwards.
+_TOD_CUTOFFS = np.array([10 * 60, 11 * 60, 13 * 60, 14 * 60 + 30], dtype=np.int32)
+_TOD_FACTORS = np.array([
+    1.4,   # high vol open
+    1.15,
+    0.85,  # lunch lull
+    1.0,
+    1.3,   # power hour
+])
+
+
+def intraday_tod_factor(timestamp):
+    """
+    Simple U-shaped time-of-day factor (US/Eastern).
+    Accepts a single Timestamp (returns a float) or a DatetimeIndex
+    (returns an array of factors).
+    """
+    minutes = np.asarray(timestamp.hour) * 60 + np.asarray(timestamp.minute)
+    factors = _TOD_FACTORS[np.searchsorted(_TOD_CUTOFFS, minutes, side="right")]
+    if factors.ndim == 0:
+        return float(factors)
+    return factors
 
-    tr0 = high - low
-    tr1 = (high - close.shift(1)).abs()
-    tr2 = (low - close.shift(1)).abs()
-    tr = pd.concat([tr0, tr1, tr2], axis=1).max(axis=1)
 
-    atr = tr.ewm(span=period, adjust=False).mean()
-    return float(atr.iloc[-1])
+# sqrt(bar minutes / 390 RTH minutes) scaling from daily to intraday ATR.
+_BASELINE = {
+    "1m": math.sqrt(1 / 390),
+    "5m": math.sqrt(5 / 390),
+}
 
 
-def intraday_tod_factor(timestamp: pd.Timestamp) -> float:
-    """
-    Simple U-shaped time-of-day factor (US/Eastern).
-    """
-    t = timestamp.time()
-    if t < dt.time(10, 0):
-        return 1.4   # high vol open
-    elif t < dt.time(11, 0):
-        return 1.15
-    elif t < dt.time(13, 0):
-        return 0.85  # lunch lull
-    elif t < dt.time(14, 30):
-        return 1.0
-    else:
-        return 1.3   # power hour
+def _baseline_factor(tf: str) -> float:
+    try:
+        return _BASELINE[tf]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported timeframe {tf!r}; expected one of {', '.join(_BASELINE)}"
+        ) from None
 
 
 def atr_intraday_from_daily(atr_daily: float, ts: pd.Timestamp, tf: str) -> float:
@@ -80,10 +341,46 @@ def atr_intraday_from_daily(atr_daily: float, ts: pd.Timestamp, tf: str) -> floa
     Convert daily ATR to intraday ATR for a given timeframe (1m or 5m),
     adjusted for time-of-day.
     """
-    minutes = 1 if tf == "1m" else 5
-    baseline_factor = math.sqrt(minutes / 390)  # RTH 390 minutes
-    baseline_tf = atr_daily * baseline_factor
-    return baseline_tf * intraday_tod_factor(ts)
+    return atr_daily * _baseline_factor(tf) * intraday_tod_factor(ts)
+
+
+@dataclass(slots=True, frozen=True)
+class StopResult:
+    """
+    Example stops and sizing for one ticker, as shown on the page.
+    """
+    ticker: str
+    timestamp: pd.Timestamp
+    entry_price: float
+    swing_low: float
+    swing_high: float
+    atr_daily: float
+    atr_tf: float
+    tf: str
+    k_atr: float
+    stop_long: float
+    dist_long: float
+    stop_short: float
+    dist_short: float
+    dollar_risk: float | None
+    shares_long: float | None
+    shares_short: float | None
+
+    def to_dict(self) -> dict:
+        """
+        JSON-friendly dict, with the timestamp as an ISO 8601 string.
+        """
+        data = asdict(self)
+        data["timestamp"] = self.timestamp.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StopResult":
+        """
+        Inverse of to_dict.
+        """
+        ts = pd.Timestamp(data["timestamp"]).tz_convert(ET)
+        return cls(**{**data, "timestamp": ts})
 
 
 def compute_example_stops(ticker: str,
@@ -97,7 +394,159 @@ def compute_example_stops(ticker: str,
     - example long/short stops based on last bar low/high
     - optional position size from dollar_risk
     """
-    daily, intra = download_data(ticker, tf=tf)
+    _baseline_factor(tf)  # reject unsupported timeframes before fetching
+
+    if _redis is None:
+        daily, intra = download_data_cached(ticker, tf=tf)
+        return _stops_from_frames(ticker, daily, intra, tf, k_atr, dollar_risk)
+
+    base_key = f"stops:{ticker.upper()}:{tf}:{k_atr}:{dollar_risk}"
+    key = f"{base_key}:{int(time.time() // RESULT_WINDOW)}"
+    cached = _redis_get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        daily, intra = download_data_cached(ticker, tf=tf)
+        result = _stops_from_frames(ticker, daily, intra, tf, k_atr, dollar_risk)
+    except Exception:
+        stale = _redis_get(base_key + ":stale")
+        if stale is None:
+            raise
+        return stale
+
+    if result is None:
+        # Empty frames are usually Yahoo throttling; prefer last-known good.
+        return _redis_get(base_key + ":stale")
+
+    _redis_set(key, RESULT_TTL, result)
+    _redis_set(base_key + ":stale", STALE_RESULT_TTL, result)
+    return result
+
+
+def _redis_get(key: str) -> StopResult | None:
+    # Redis being down, or an entry we can't decode (corrupt, or written by
+    # a deploy with different StopResult fields), only costs us the cache.
+    try:
+        data = _redis.get(key)
+        if data is None:
+            return None
+        return StopResult.from_dict(json.loads(data))
+    except (redis.RedisError, ValueError, TypeError, KeyError):
+        return None
+
+
+def _redis_set(key: str, ttl: int, value: StopResult) -> None:
+    try:
+        _redis.setex(key, ttl, json.dumps(value.to_dict()))
+    except redis.RedisError:
+        pass
+
+
+def _split_batch(data: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """
+    Pull one ticker's OHLC out of a group_by="ticker" yf.download frame
+    as a plain single-level frame (empty if the symbol is missing).
+    """
+    if data is None:
+        return pd.DataFrame()
+    if not isinstance(data.columns, pd.MultiIndex):
+        # A single-symbol download may come back already flattened.
+        return data
+    if ticker not in data.columns.get_level_values(0):
+        return pd.DataFrame()
+    # Rows are the union of all symbols' dates; drop the ones this
+    # ticker has no bars for.
+    return data[ticker].dropna(how="all")
+
+
+def compute_example_stops_many(tickers: list[str],
+                               tf: str = "5m",
+                               k_atr: float = 0.7,
+                               dollar_risk: float | None = None):
+    """
+    compute_example_stops for a whole watchlist. Symbols already in the
+    data cache are served from it and ones being downloaded are joined;
+    the rest are fetched together with one yf.download for daily bars and
+    one for intraday bars, and the results are cached.
+    (yf.download still sends one chart request per symbol, in threads,
+    so batching saves Python-side work, not Yahoo requests.)
+    Returns {TICKER: result or None}.
+    """
+    _baseline_factor(tf)  # reject unsupported timeframes before fetching
+
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    frames = {}
+    misses = []
+    minute = int(time.time() // 60)
+    with _data_cache_lock:
+        for t in symbols:
+            data = _data_cache.get((t, tf, minute))
+            if data is not None:
+                _data_cache.move_to_end((t, tf, minute))
+                frames[t] = data
+            elif (t, tf) not in _data_inflight:
+                misses.append(t)
+    if misses:
+        frames.update(_download_batch(misses, tf))
+
+    results = {}
+    for t in symbols:
+        if t in frames:
+            daily, intra = frames[t]
+        else:
+            # Being fetched elsewhere, or missing from the batch.
+            daily, intra = download_data_cached(t, tf=tf)
+        results[t] = _stops_from_frames(t, daily, intra, tf, k_atr, dollar_risk)
+    return results
+
+
+def _download_batch(symbols: list[str], tf: str) -> dict:
+    """
+    Batched download_data for several symbols, reusing cached daily bars.
+    Returns {TICKER: (daily, intra)} for the symbols Yahoo returned, and
+    adds them to the data cache.
+    """
+    daily_bucket = int(time.time() // DAILY_CACHE_SECONDS)
+    with _data_cache_lock:
+        dailies = {t: _daily_cache[(t, daily_bucket)]
+                   for t in symbols if (t, daily_bucket) in _daily_cache}
+    daily_misses = [t for t in symbols if t not in dailies]
+
+    # Same rate-limited session as single-ticker fetches, so yfinance's
+    # per-symbol threads still respect the shared limit.
+    if daily_misses:
+        batch_daily = yf.download(" ".join(daily_misses), period=DAILY_PERIOD,
+                                  interval="1d", group_by="ticker",
+                                  threads=True, auto_adjust=False,
+                                  progress=False, session=SESSION)
+        for t in daily_misses:
+            dailies[t] = _split_batch(batch_daily, t)
+    batch_intra = yf.download(" ".join(symbols), period=INTRADAY_PERIOD,
+                              interval=tf, group_by="ticker", threads=True,
+                              auto_adjust=False, progress=False,
+                              session=SESSION)
+
+    frames = {}
+    for t in symbols:
+        intra = _split_batch(batch_intra, t)
+        if not (dailies[t].empty or intra.empty):
+            frames[t] = (dailies[t], _regular_hours(intra))
+
+    minute = int(time.time() // 60)
+    with _data_cache_lock:
+        for t, data in frames.items():
+            _cache_put(_daily_cache, (t, daily_bucket), data[0])
+            _cache_put(_data_cache, (t, tf, minute), data)
+    return frames
+
+
+def _stops_from_frames(ticker: str,
+                       daily: pd.DataFrame,
+                       intra: pd.DataFrame,
+                       tf: str,
+                       k_atr: float,
+                       dollar_risk: float | None):
     if daily.empty or intra.empty:
         return None
 
@@ -130,24 +579,51 @@ def compute_example_stops(ticker: str,
         if dist_short > 0:
             shares_short = dollar_risk / dist_short
 
-    return {
-        "ticker": ticker.upper(),
-        "timestamp": ts,
-        "entry_price": entry,
-        "swing_low": swing_low,
-        "swing_high": swing_high,
-        "atr_daily": atr_daily,
-        "atr_tf": atr_tf,
-        "tf": tf,
-        "k_atr": k_atr,
-        "stop_long": stop_long,
-        "dist_long": dist_long,
-        "stop_short": stop_short,
-        "dist_short": dist_short,
-        "dollar_risk": dollar_risk,
-        "shares_long": shares_long,
-        "shares_short": shares_short,
-    }
+    return StopResult(
+        ticker=ticker.upper(),
+        timestamp=ts,
+        entry_price=entry,
+        swing_low=swing_low,
+        swing_high=swing_high,
+        atr_daily=atr_daily,
+        atr_tf=atr_tf,
+        tf=tf,
+        k_atr=k_atr,
+        stop_long=stop_long,
+        dist_long=dist_long,
+        stop_short=stop_short,
+        dist_short=dist_short,
+        dollar_risk=dollar_risk,
+        shares_long=shares_long,
+        shares_short=shares_short,
+    )
+
+
+def _parse_stop_params(values):
+    """
+    Read ticker / timeframe / k / dollar risk from submitted form values,
+    falling back to the UI defaults for anything missing or unparsable.
+    """
+    ticker = values.get("ticker", "").strip()
+    tf = values.get("timeframe", "5m")
+    if tf not in _BASELINE:
+        tf = "5m"
+    k_atr_str = values.get("k_atr", "0.7").strip()
+    risk_str = values.get("dollar_risk", "").strip()
+
+    try:
+        k_atr = float(k_atr_str) if k_atr_str else 0.7
+    except ValueError:
+        k_atr = 0.7
+
+    dollar_risk = None
+    if risk_str:
+        try:
+            dollar_risk = float(risk_str)
+        except ValueError:
+            dollar_risk = None
+
+    return ticker, tf, k_atr, dollar_risk, risk_str
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -155,29 +631,26 @@ def index():
     result = None
     error = None
     # Defaults shown in the UI
+    current_ticker = ""
     current_tf = "5m"
     current_dollar_risk = ""
 
+    if request.method == "GET":
+        # e.g. /?ticker=SPY: prefill the form and start fetching now, so the
+        # user's submit is served from cache.
+        current_ticker, current_tf, _, _, current_dollar_risk = (
+            _parse_stop_params(request.args)
+        )
+        if current_ticker:
+            _start_prefetch(current_ticker, current_tf)
+
     if request.method == "POST":
-        ticker = request.form.get("ticker", "").strip()
-        current_tf = request.form.get("timeframe", "5m")
-        k_atr_str = request.form.get("k_atr", "0.7").strip()
-        risk_str = request.form.get("dollar_risk", "").strip()
-        current_dollar_risk = risk_str
+        ticker, current_tf, k_atr, dollar_risk, current_dollar_risk = (
+            _parse_stop_params(request.form)
+        )
+        current_ticker = ticker
 
         if ticker:
-            try:
-                k_atr = float(k_atr_str) if k_atr_str else 0.7
-            except ValueError:
-                k_atr = 0.7
-
-            dollar_risk = None
-            if risk_str:
-                try:
-                    dollar_risk = float(risk_str)
-                except ValueError:
-                    dollar_risk = None
-
             try:
                 result = compute_example_stops(
                     ticker, tf=current_tf, k_atr=k_atr, dollar_risk=dollar_risk
@@ -193,10 +666,76 @@ def index():
         "index.html",
         result=result,
         error=error,
+        current_ticker=current_ticker,
         current_tf=current_tf,
         current_dollar_risk=current_dollar_risk,
     )
 
 
+def _round_sig(value, digits: int = 8):
+    # Trim JSON floats to significant digits (not decimal places, which
+    # would zero out sub-penny prices). Non-floats pass through.
+    if isinstance(value, float):
+        return float(f"{value:.{digits}g}")
+    return value
+
+
+def _stops_etag(ticker: str, tf: str, k_atr: float,
+                dollar_risk: float | None, window: int) -> str:
+    # Derived from the inputs rather than the body, so it's known before
+    # anything is downloaded.
+    key = f"{ticker.upper()}:{tf}:{k_atr}:{dollar_risk}:{window}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+@app.route("/api/stops", methods=["GET", "POST"])
+def api_stops():
+    """
+    JSON version of the stop calculation. Takes the same fields as the
+    form (query string or form body).
+    GET responses are cacheable until the end of the current
+    RESULT_WINDOW-second window and carry an ETag for the inputs plus that
+    window; a GET re-sending it in If-None-Match gets a 304 without any
+    download. POST responses are never cached.
+    """
+    ticker, tf, k_atr, dollar_risk, _ = _parse_stop_params(request.values)
+    if not ticker:
+        return jsonify({"error": "Please enter a ticker symbol."}), 400
+
+    cacheable = request.method in ("GET", "HEAD")
+    if cacheable:
+        now = time.time()
+        etag = _stops_etag(ticker, tf, k_atr, dollar_risk,
+                           int(now // RESULT_WINDOW))
+        cache_control = f"public, max-age={RESULT_WINDOW - int(now) % RESULT_WINDOW}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = cache_control
+            return response
+
+    try:
+        result = compute_example_stops(
+            ticker, tf=tf, k_atr=k_atr, dollar_risk=dollar_risk
+        )
+    except YahooBusy as e:
+        return jsonify({"error": f"Error: {e}"}), 503
+    except Exception as e:
+        return jsonify({"error": f"Error: {e}"}), 502
+    if result is None:
+        return jsonify(
+            {"error": "Could not compute ATR / intraday data for this ticker."}
+        ), 404
+
+    response = jsonify({k: _round_sig(v) for k, v in result.to_dict().items()})
+    if cacheable:
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+    return response
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    # Threaded WSGI server so requests waiting on Yahoo don't queue behind
+    # each other (the Procfile runs gunicorn with gthread workers instead).
+    from waitress import serve
+    serve(app, host="0.0.0.0", port=5000, threads=SERVER_THREADS)
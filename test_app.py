@@ -0,0 +1,510 @@
+import json
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+import redis
+from curl_cffi import requests as curl_requests
+from pyrate_limiter import Duration, Limiter, RequestRate
+
+import app
+
+
+def reference_atr(daily: pd.DataFrame, period: int = 14) -> float:
+    # The original pandas implementation of compute_atr.
+    high = daily["High"]
+    low = daily["Low"]
+    close = daily["Close"]
+
+    tr0 = high - low
+    tr1 = (high - close.shift(1)).abs()
+    tr2 = (low - close.shift(1)).abs()
+    tr = pd.concat([tr0, tr1, tr2], axis=1).max(axis=1)
+
+    atr = tr.ewm(span=period, adjust=False).mean()
+    return float(atr.iloc[-1])
+
+
+def make_daily(n: int = 30, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, n))
+    high = close + rng.uniform(0.1, 2.0, n)
+    low = close - rng.uniform(0.1, 2.0, n)
+    return pd.DataFrame(
+        {"Open": close, "High": high, "Low": low, "Close": close},
+        index=pd.date_range("2026-09-01", periods=n, freq="B"),
+    )
+
+
+def make_intraday(n: int = 60, day: str = "2026-10-13") -> pd.DataFrame:
+    idx = pd.date_range(f"{day} 09:30", periods=n, freq="5min", tz=app.ET)
+    close = 100 + np.linspace(0, 1, n)
+    return pd.DataFrame(
+        {"Open": close, "High": close + 0.5, "Low": close - 0.5,
+         "Close": close, "Volume": 1000},
+        index=idx,
+    )
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    app._data_cache.clear()
+    app._daily_cache.clear()
+    app._data_inflight.clear()
+    yield
+    app._data_cache.clear()
+    app._daily_cache.clear()
+    app._data_inflight.clear()
+
+
+@pytest.fixture
+def history(monkeypatch):
+    """
+    Replace the Yahoo fetch with canned frames; returns the list of
+    (ticker, interval) calls made.
+    """
+    calls = []
+
+    def fake_history(ticker, period, interval):
+        calls.append((ticker, interval))
+        return make_daily() if interval == "1d" else make_intraday()
+
+    monkeypatch.setattr(app, "_history", fake_history)
+    return calls
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Freeze app's time.time(); set clock.now to move it.
+    """
+    clock = types.SimpleNamespace(now=app.DAILY_CACHE_SECONDS * 100_000 + 100.0)
+    monkeypatch.setattr(app, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.mark.parametrize("nan_rows", [
+    [],
+    [0],           # leading gap
+    [0, 1],
+    [10],          # interior gap
+    [10, 11, 12],
+    [0, 15, 29],
+])
+def test_compute_atr_matches_pandas(nan_rows):
+    daily = make_daily()
+    daily.iloc[nan_rows, :] = np.nan
+
+    assert app.compute_atr(daily) == pytest.approx(reference_atr(daily), rel=1e-12)
+
+
+def test_compute_atr_partial_nan_bar():
+    # Only the close missing: that bar's TR still has high - low, while the
+    # next bar loses both previous-close terms.
+    daily = make_daily()
+    daily.iloc[5, daily.columns.get_loc("Close")] = np.nan
+
+    assert app.compute_atr(daily) == pytest.approx(reference_atr(daily), rel=1e-12)
+
+
+@pytest.mark.parametrize("period", [5, 14, 20])
+def test_compute_atr_period(period):
+    daily = make_daily(seed=1)
+
+    assert app.compute_atr(daily, period=period) == pytest.approx(
+        reference_atr(daily, period=period), rel=1e-12
+    )
+
+
+def test_daily_bars_reused_across_minutes(history, clock):
+    app.download_data_cached("SPY", "5m")
+    clock.now += 60
+    app.download_data_cached("SPY", "5m")
+
+    assert history.count(("SPY", "5m")) == 2
+    assert history.count(("SPY", "1d")) == 1
+
+
+def test_daily_bars_refetched_after_daily_window(history, clock):
+    app.download_data_cached("SPY", "5m")
+    clock.now += app.DAILY_CACHE_SECONDS
+
+    app.download_data_cached("SPY", "5m")
+
+    assert history.count(("SPY", "1d")) == 2
+
+
+def test_limited_session_gives_up_after_max_delay(monkeypatch):
+    monkeypatch.setattr(curl_requests.Session, "request",
+                        lambda self, method, url, *a, **kw: "ok")
+    session = app.LimitedSession(Limiter(RequestRate(1, Duration.MINUTE)),
+                                 max_delay=0.01)
+
+    assert session.get("https://example.invalid/") == "ok"
+    with pytest.raises(app.YahooBusy):
+        session.get("https://example.invalid/")
+
+
+@pytest.fixture
+def slow_download(monkeypatch):
+    """
+    Replace download_data with one that blocks until .release is set and
+    then returns canned frames (or raises .error, if set).
+    """
+    slow = types.SimpleNamespace(release=threading.Event(), calls=[], error=None)
+
+    def fake_download(ticker, tf="5m", daily=None):
+        slow.calls.append(ticker)
+        slow.release.wait(5)
+        if slow.error is not None:
+            raise slow.error
+        return make_daily(), make_intraday()
+
+    monkeypatch.setattr(app, "download_data", fake_download)
+    return slow
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_in_thread(fn, *args):
+    out = {}
+
+    def target():
+        try:
+            out["value"] = fn(*args)
+        except BaseException as e:
+            out["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, out
+
+
+def test_concurrent_callers_share_one_download(slow_download):
+    owner, owner_out = run_in_thread(app.download_data_cached, "SPY", "5m")
+    wait_until(lambda: ("SPY", "5m") in app._data_inflight)
+    joiner, joiner_out = run_in_thread(app.download_data_cached, "spy", "5m")
+    time.sleep(0.05)
+
+    slow_download.release.set()
+    owner.join(5)
+    joiner.join(5)
+
+    assert slow_download.calls == ["SPY"]
+    assert joiner_out["value"] is owner_out["value"]
+    assert app._data_inflight == {}
+
+
+def test_download_error_reaches_joiners(slow_download):
+    slow_download.error = RuntimeError("yahoo down")
+    owner, owner_out = run_in_thread(app.download_data_cached, "SPY", "5m")
+    wait_until(lambda: ("SPY", "5m") in app._data_inflight)
+    joiner, joiner_out = run_in_thread(app.download_data_cached, "SPY", "5m")
+    time.sleep(0.05)
+
+    slow_download.release.set()
+    owner.join(5)
+    joiner.join(5)
+
+    assert slow_download.calls == ["SPY"]
+    assert isinstance(owner_out["error"], RuntimeError)
+    assert joiner_out["error"] is owner_out["error"]
+    assert app._data_inflight == {}
+    assert app._data_cache == {}
+
+
+def test_joiner_gives_up_after_max_wait(slow_download, monkeypatch):
+    monkeypatch.setattr(app, "YAHOO_MAX_WAIT", 0.05)
+    owner, owner_out = run_in_thread(app.download_data_cached, "SPY", "5m")
+    wait_until(lambda: ("SPY", "5m") in app._data_inflight)
+
+    with pytest.raises(app.YahooBusy):
+        app.download_data_cached("SPY", "5m")
+
+    slow_download.release.set()
+    owner.join(5)
+    assert "value" in owner_out
+    assert app._data_inflight == {}
+
+
+def test_prefetch_is_bounded_and_releases_its_slot(slow_download, monkeypatch):
+    monkeypatch.setattr(app, "_prefetch_slots", threading.BoundedSemaphore(1))
+
+    app._start_prefetch("spy", "5m")
+    wait_until(lambda: slow_download.calls == ["SPY"])
+    app._start_prefetch("QQQ", "5m")        # no free slot: dropped
+    app._start_prefetch("SPY", "5m")        # already in flight
+    app._start_prefetch("not a ticker", "5m")
+
+    slow_download.release.set()
+    wait_until(lambda: ("SPY", "5m") not in app._data_inflight)
+    wait_until(lambda: app._prefetch_slots._value == 1)
+    app._start_prefetch("IWM", "5m")
+    wait_until(lambda: "IWM" in slow_download.calls)
+
+    assert slow_download.calls == ["SPY", "IWM"]
+    wait_until(lambda: app._prefetch_slots._value == 1)
+
+
+def test_split_batch_multi_symbol():
+    spy, qqq = make_daily(seed=1), make_daily(seed=2).iloc[5:]
+    batch = pd.concat({"SPY": spy, "QQQ": qqq}, axis=1)
+
+    pd.testing.assert_frame_equal(app._split_batch(batch, "SPY"), spy,
+                                  check_freq=False)
+    # Rows that only exist for other symbols are dropped.
+    pd.testing.assert_frame_equal(app._split_batch(batch, "QQQ"), qqq,
+                                  check_freq=False)
+
+
+def test_split_batch_missing_symbol():
+    batch = pd.concat({"SPY": make_daily()}, axis=1)
+
+    assert app._split_batch(batch, "IWM").empty
+    assert app._split_batch(None, "IWM").empty
+
+
+def test_split_batch_single_symbol_shapes():
+    daily = make_daily()
+
+    # group_by="ticker" with one symbol still returns (ticker, field) columns.
+    multi = pd.concat({"SPY": daily}, axis=1)
+    assert isinstance(multi.columns, pd.MultiIndex)
+    pd.testing.assert_frame_equal(app._split_batch(multi, "SPY"), daily,
+                                  check_freq=False)
+    # Older yfinance flattens a single-symbol download.
+    pd.testing.assert_frame_equal(app._split_batch(daily, "SPY"), daily)
+
+
+def test_compute_example_stops_many_uses_and_fills_cache(history, clock,
+                                                          monkeypatch):
+    downloads = []
+
+    def fake_download(tickers, period, interval, **kwargs):
+        downloads.append((tickers, interval))
+        frame = make_daily() if interval == "1d" else make_intraday()
+        # IWM is missing from Yahoo's batch answer.
+        return pd.concat({t: frame for t in tickers.split() if t != "IWM"},
+                         axis=1)
+
+    monkeypatch.setattr(app.yf, "download", fake_download)
+    app.download_data_cached("SPY", "5m")
+    history.clear()
+
+    results = app.compute_example_stops_many(["spy", "QQQ", "IWM", "qqq"])
+
+    assert list(results) == ["SPY", "QQQ", "IWM"]
+    assert all(r is not None for r in results.values())
+    assert downloads == [("QQQ IWM", "1d"), ("QQQ IWM", "5m")]
+    assert sorted(history) == [("IWM", "1d"), ("IWM", "5m")]   # single-ticker fallback
+
+    downloads.clear()
+    history.clear()
+    app.compute_example_stops_many(["SPY", "QQQ", "IWM"])
+    assert downloads == [] and history == []
+
+
+def test_compute_example_stops_many_reuses_cached_daily_bars(history, clock,
+                                                             monkeypatch):
+    downloads = []
+
+    def fake_download(tickers, period, interval, **kwargs):
+        downloads.append((tickers, interval))
+        frame = make_daily() if interval == "1d" else make_intraday()
+        return pd.concat({t: frame for t in tickers.split()}, axis=1)
+
+    monkeypatch.setattr(app.yf, "download", fake_download)
+    app.download_data_cached("SPY", "5m")
+    clock.now += 60
+
+    app.compute_example_stops_many(["SPY", "QQQ"])
+
+    assert downloads == [("QQQ", "1d"), ("SPY QQQ", "5m")]
+
+
+def test_compute_example_stops_many_rejects_bad_tf(monkeypatch):
+    monkeypatch.setattr(app.yf, "download", pytest.fail)
+
+    with pytest.raises(ValueError):
+        app.compute_example_stops_many(["SPY"], tf="15m")
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_api_stops_get_is_cacheable(client, history, clock):
+    resp = client.get("/api/stops?ticker=spy&dollar_risk=500")
+
+    assert resp.status_code == 200
+    assert resp.json["ticker"] == "SPY"
+    assert resp.json["timestamp"].endswith("-04:00")
+    assert resp.headers["ETag"]
+    assert resp.headers["Cache-Control"].startswith("public, max-age=")
+
+
+def test_api_stops_matching_etag_skips_download(client, history, clock):
+    etag = client.get("/api/stops?ticker=SPY").headers["ETag"]
+    app._data_cache.clear()
+    app._daily_cache.clear()
+    history.clear()
+
+    resp = client.get("/api/stops?ticker=SPY", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    assert history == []
+
+
+def test_api_stops_etag_changes_with_window(client, history, clock):
+    etag = client.get("/api/stops?ticker=SPY").headers["ETag"]
+    clock.now += app.RESULT_WINDOW
+
+    resp = client.get("/api/stops?ticker=SPY", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_api_stops_post_is_not_cached(client, history):
+    resp = client.post("/api/stops", data={"ticker": "SPY"})
+
+    assert resp.status_code == 200
+    assert "ETag" not in resp.headers
+    assert "Cache-Control" not in resp.headers
+
+
+def test_api_stops_missing_ticker(client):
+    resp = client.get("/api/stops")
+
+    assert resp.status_code == 400
+    assert resp.json == {"error": "Please enter a ticker symbol."}
+
+
+def test_api_stops_no_data(client, monkeypatch):
+    monkeypatch.setattr(app, "_history", lambda *args: pd.DataFrame())
+
+    resp = client.get("/api/stops?ticker=NOPE")
+
+    assert resp.status_code == 404
+    assert resp.json == {
+        "error": "Could not compute ATR / intraday data for this ticker."
+    }
+
+
+@pytest.mark.parametrize("error, status", [
+    (RuntimeError("boom"), 502),
+    (app.YahooBusy("slow down"), 503),
+])
+def test_api_stops_fetch_errors(client, monkeypatch, error, status):
+    def failing_history(*args):
+        raise error
+
+    monkeypatch.setattr(app, "_history", failing_history)
+
+    resp = client.get("/api/stops?ticker=SPY")
+
+    assert resp.status_code == status
+    assert resp.json == {"error": f"Error: {error}"}
+
+
+def test_index_renders_through_the_api(client):
+    resp = client.get("/")
+
+    assert resp.status_code == 200
+    assert 'fetch("/api/stops?"' in resp.get_data(as_text=True)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value.encode() if isinstance(value, str) else value
+
+
+class DownRedis:
+    def get(self, key):
+        raise redis.ConnectionError("down")
+
+    def setex(self, key, ttl, value):
+        raise redis.ConnectionError("down")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(app, "_redis", fake)
+    return fake
+
+
+def make_result() -> app.StopResult:
+    return app._stops_from_frames("SPY", make_daily(), make_intraday(),
+                                  "5m", 0.7, 1000.0)
+
+
+def test_stop_result_round_trip_keeps_timezone():
+    result = make_result()
+
+    back = app.StopResult.from_dict(json.loads(json.dumps(result.to_dict())))
+
+    assert back == result
+    assert back.timestamp.tz is not None
+    assert back.timestamp.utcoffset() == result.timestamp.utcoffset()
+    assert str(back.timestamp) == str(result.timestamp)
+
+
+@pytest.mark.parametrize("raw", [
+    b"not json",
+    b'{"ticker": "SPY"}',
+    json.dumps({**make_result().to_dict(), "renamed": 1}).encode(),
+    json.dumps({**make_result().to_dict(), "timestamp": "yesterday"}).encode(),
+])
+def test_redis_get_treats_bad_entries_as_miss(fake_redis, raw):
+    fake_redis.store["k"] = raw
+
+    assert app._redis_get("k") is None
+
+
+def test_redis_outage_is_a_cache_miss(history, monkeypatch):
+    monkeypatch.setattr(app, "_redis", DownRedis())
+
+    assert app.compute_example_stops("SPY") is not None
+
+
+def test_redis_serves_fresh_entry(fake_redis, history, clock):
+    first = app.compute_example_stops("SPY", dollar_risk=1000.0)
+    app._data_cache.clear()
+    history.clear()
+
+    assert app.compute_example_stops("SPY", dollar_risk=1000.0) == first
+    assert history == []
+
+
+def test_redis_stale_copy_served_when_yahoo_fails(fake_redis, history, clock,
+                                                monkeypatch):
+    good = app.compute_example_stops("SPY", dollar_risk=1000.0)
+    clock.now += app.RESULT_WINDOW * 2   # fresh entry no longer applies
+    app._data_cache.clear()
+    app._daily_cache.clear()
+
+    def failing_history(*args):
+        raise RuntimeError("yahoo down")
+
+    monkeypatch.setattr(app, "_history", failing_history)
+
+    assert app.compute_example_stops("SPY", dollar_risk=1000.0) == good
+    with pytest.raises(RuntimeError):
+        app.compute_example_stops("QQQ", dollar_risk=1000.0)